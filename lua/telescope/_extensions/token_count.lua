@@ -29,6 +29,7 @@ local function model_picker(callback)
 				-- Update the plugin configuration
 				local config = require("token-count.config").get()
 				config.model = technical_name
+				require("token-count.init.setup").prewarm_daemon()
 
 				vim.notify(string.format("Model changed to: %s", model_config.name), vim.log.levels.INFO)
 			end
@@ -281,6 +281,12 @@ function M.update_cache_with_count(file_path, token_count, notify)
 		return
 	end
 
+	-- An entry with the same count still matches the file it was counted from, so it
+	-- keeps the signature that lets unchanged files skip recounting
+	local previous = inst.cache[file_path]
+	local signature = previous and previous.status == "ready" and previous.count == token_count and previous.signature
+		or nil
+
 	local formatted = processor.format_token_count(token_count)
 	inst.cache[file_path] = {
 		count = token_count,
@@ -288,6 +294,7 @@ function M.update_cache_with_count(file_path, token_count, notify)
 		timestamp = vim.loop.hrtime() / 1000000,
 		status = "ready",
 		type = "file",
+		signature = signature,
 	}
 
 	-- Notify UI components of cache update
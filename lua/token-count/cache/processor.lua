@@ -122,6 +122,30 @@ end
     callback(true, {count = 999999, formatted = formatted})
 end
  
+--- Identify a file's current contents and the settings counting them, without reading the file
+--- @param file_path string File path
+--- @return string|nil signature nil if the file cannot be stat'ed
+local function content_signature(file_path)
+    local stat = vim.loop.fs_stat(file_path)
+    if not stat then
+        return nil
+    end
+    local config = require("token-count.config").get()
+    -- Everything that can change the count of unchanged contents: the model, whether
+    -- large files are estimated, and whether official APIs do the counting
+    return string.format(
+        "%s:%s:%s:%s:%s:%d.%d:%d",
+        config.model,
+        tostring(config.exact_counts),
+        tostring(config.exact_threshold),
+        tostring(config.enable_official_anthropic_counter),
+        tostring(config.enable_official_gemini_counter),
+        stat.mtime.sec,
+        stat.mtime.nsec or 0,
+        stat.size
+    )
+end
+
 --- @param callback function Callback function
 function M.process_file(file_path, callback)
     local instance = require("token-count.cache.instance").get_instance()
@@ -153,6 +177,24 @@ function M.process_file(file_path, callback)
         end
     end
     
+    -- Unchanged since the last count (same mtime, size and settings): reuse it without
+    -- reading the file or tokenizing anything
+    local signature = content_signature(file_path)
+    local cached = instance.cache[file_path]
+    if signature and cached and cached.status == "ready" and cached.signature == signature then
+        cached.timestamp = vim.loop.hrtime() / 1000000
+        callback(true, {count = cached.count, formatted = cached.formatted})
+        return
+    end
+    
+    local function remember_signature(success, result)
+        local entry = instance.cache[file_path]
+        if success and entry and entry.status == "ready" then
+            entry.signature = signature
+        end
+        callback(success, result)
+    end
+    
     -- Track active job
     processing_stats.active_jobs = processing_stats.active_jobs + 1
     instance.processing[file_path] = true
@@ -169,13 +211,13 @@ function M.process_file(file_path, callback)
         
         if content == "" then
             M._cache_empty_file(file_path, instance)
-            callback(true, {count = 0, formatted = "0"})
+            remember_signature(true, {count = 0, formatted = "0"})
             return
         end
         
         -- Yield control more frequently during processing
         M._maybe_yield(function()
-            M._process_content_background(file_path, content, callback)
+            M._process_content_background(file_path, content, remember_signature)
         end)
     end)
 end
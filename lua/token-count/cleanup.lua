@@ -258,6 +258,12 @@ function M.cleanup_all()
 	tracked_resources.jobs = {}
 	job_timestamps = {}
 
+	-- Stop the persistent token counter process
+	local daemon_ok, daemon = pcall(require, "token-count.daemon")
+	if daemon_ok then
+		pcall(daemon.stop)
+	end
+
 	-- Clean up autocommand groups
 	for identifier, group_id in pairs(tracked_resources.autocommand_groups) do
 		pcall(vim.api.nvim_del_augroup_by_id, group_id)
@@ -38,6 +38,7 @@ function M.change_model()
 
 			local current_config = config.get()
 			current_config.model = selected_model
+			require("token-count.init.setup").prewarm_daemon()
 
 			local context_window_formatted = formatting.format_number_with_commas(model_config.context_window)
 
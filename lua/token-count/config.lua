@@ -6,6 +6,8 @@ M.defaults = {
 	context_warning_threshold = 0.4, -- Warn when buffers use >40% of context window
 	enable_official_anthropic_counter = false, -- Use official Anthropic API for token counting
 	enable_official_gemini_counter = false, -- Use official Gemini API for token counting
+	exact_counts = false, -- Estimate Claude/Gemini locally instead of via remote count APIs
+	exact_threshold = 200000, -- Estimate texts longer than this many characters from samples (false to disable)
 	ignore_patterns = { -- Patterns to ignore during background processing
 		"node_modules/.*",
 		"%.git/.*",
@@ -57,6 +59,10 @@ local function validate_config(config)
 		end
 	end
 
+	if config.exact_threshold and (type(config.exact_threshold) ~= "number" or config.exact_threshold <= 0) then
+		table.insert(errors, "exact_threshold must be a positive number or false")
+	end
+
 	-- Validate cache configuration
 	if config.cache then
 		if config.cache.interval and (type(config.cache.interval) ~= "number" or config.cache.interval < 1000) then
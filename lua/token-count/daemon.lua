@@ -0,0 +1,421 @@
+--- Persistent token counting daemon
+--- Keeps a single Python process alive so interpreter startup and tokenizer loading
+--- are paid once instead of on every count. Requests and responses are exchanged as
+--- JSON messages over the process's stdin/stdout, each prefixed with its length as a
+--- 4-byte big-endian integer so large texts need no delimiter scanning.
+local M = {}
+
+-- Resolved without vim.fn so requests can be issued from fast event contexts
+local plugin_dir = debug.getinfo(1, "S").source:sub(2):match("(.*[/\\])") or "./"
+local script_path = plugin_dir .. "providers/counter_daemon.py"
+
+local DAEMON_CONFIG = {
+	sync_timeout = 30000, -- Maximum time to block for synchronous counts (ms)
+	chunked_min_size = 16384, -- Texts at least this long are counted chunk by chunk
+}
+
+-- Providers whose chunked counts add up to their whole-text counts at the boundaries
+-- split_chunks in counter_daemon.py picks; read its docstring before adding one, as
+-- pre-tokenizers do merge across some line breaks (punctuation absorbs them, and "/" in o200k)
+local CHUNKABLE_PROVIDERS = {
+	tiktoken = true,
+	deepseek = true,
+}
+
+-- Messages for the error codes the daemon reports instead of formatted error strings
+local ERROR_MESSAGES = {
+	no_api_key = "%s environment variable not set",
+	bad_api_key = "API key was rejected",
+	rate_limited = "Rate limited by the API, try again shortly",
+	network_error = "Could not reach the API, check your internet connection",
+}
+
+local state = {
+	handle = nil,
+	pid = nil,
+	stdin = nil,
+	stdout = nil,
+	stderr = nil,
+	read_buffer = "",
+	next_id = 0,
+	pending = {}, -- request id -> callback(response, error)
+	env = nil, -- environment_signature() when the daemon was spawned
+}
+
+-- Environment the daemon reads after it starts; spawned processes keep the values they
+-- were started with, so the daemon is restarted when any of these change
+local DAEMON_ENVIRONMENT = { "ANTHROPIC_API_KEY", "GOOGLE_API_KEY" }
+
+local function environment_signature()
+	local values = {}
+	for i, name in ipairs(DAEMON_ENVIRONMENT) do
+		values[i] = vim.loop.os_getenv(name) or ""
+	end
+	return table.concat(values, "\0")
+end
+
+local function log_scheduled(level, message)
+	vim.schedule(function()
+		require("token-count.log")[level](message)
+	end)
+end
+
+local function close_pipe(pipe)
+	if pipe and not pipe:is_closing() then
+		pipe:close()
+	end
+end
+
+--- Fail all in-flight requests and reset process state
+--- @param reason string Error message passed to pending callbacks
+local function reset(reason)
+	local pending = state.pending
+
+	close_pipe(state.stdin)
+	close_pipe(state.stdout)
+	close_pipe(state.stderr)
+	if state.handle and not state.handle:is_closing() then
+		state.handle:close()
+	end
+
+	state.handle = nil
+	state.pid = nil
+	state.stdin = nil
+	state.stdout = nil
+	state.stderr = nil
+	state.read_buffer = ""
+	state.pending = {}
+
+	for _, callback in pairs(pending) do
+		vim.schedule(function()
+			callback(nil, reason)
+		end)
+	end
+end
+
+--- Prefix a message with its length as a 4-byte big-endian integer
+--- @param body string Encoded message
+--- @return string frame
+local function encode_frame(body)
+	local length = #body
+	return string.char(
+		math.floor(length / 16777216) % 256,
+		math.floor(length / 65536) % 256,
+		math.floor(length / 256) % 256,
+		length % 256
+	) .. body
+end
+
+--- Turn an error code response into a readable message
+--- @param code string Error code reported by the daemon
+--- @param detail string|nil Code-specific detail, such as the missing environment variable
+--- @return string message
+local function describe_error(code, detail)
+	local message = ERROR_MESSAGES[code]
+	if not message then
+		return code
+	end
+	return message:format(detail or "API key")
+end
+
+--- Route a decoded response to the callback waiting for it
+--- @param body string One JSON-encoded response
+local function handle_response(body)
+	local ok, response = pcall(vim.json.decode, body)
+	if not ok or type(response) ~= "table" then
+		log_scheduled("warn", "Invalid response from token counter daemon: " .. body)
+		return
+	end
+
+	local id = response.id
+	if id == nil or id == vim.NIL then
+		-- The request could not be decoded far enough to read its id; the daemon answers
+		-- in order, so the reply belongs to the oldest request still waiting
+		for pending_id in pairs(state.pending) do
+			if id == nil or id == vim.NIL or pending_id < id then
+				id = pending_id
+			end
+		end
+	end
+
+	local callback = state.pending[id]
+	if not callback then
+		return
+	end
+	state.pending[id] = nil
+
+	vim.schedule(function()
+		if type(response.error) == "string" then
+			callback(nil, response.error)
+		elseif type(response.code) == "string" then
+			callback(nil, describe_error(response.code, response.detail))
+		else
+			callback(response, nil)
+		end
+	end)
+end
+
+local function on_stdout(err, data)
+	if err or not data then
+		return
+	end
+
+	state.read_buffer = state.read_buffer .. data
+	while #state.read_buffer >= 4 do
+		local b1, b2, b3, b4 = state.read_buffer:byte(1, 4)
+		local length = ((b1 * 256 + b2) * 256 + b3) * 256 + b4
+		if #state.read_buffer < 4 + length then
+			break
+		end
+		local body = state.read_buffer:sub(5, 4 + length)
+		state.read_buffer = state.read_buffer:sub(5 + length)
+		handle_response(body)
+	end
+end
+
+local function on_stderr(err, data)
+	if not err and data then
+		log_scheduled("info", "Token counter daemon: " .. data:gsub("%s+$", ""))
+	end
+end
+
+--- Check if the daemon process is running
+--- @return boolean running
+function M.is_running()
+	return state.handle ~= nil and not state.handle:is_closing()
+end
+
+--- Start the daemon if it is not already running
+--- @return boolean success Whether the daemon is running
+--- @return string|nil error Error message if it could not be started
+function M.start()
+	local env = environment_signature()
+	if M.is_running() then
+		if state.env == env then
+			return true, nil
+		end
+		-- API keys set or changed since the daemon started (e.g. through vim.env)
+		log_scheduled("info", "API keys changed, restarting token counter daemon")
+		M.stop()
+	end
+
+	local python_path = require("token-count.venv").get_python_path()
+
+	local stdin = vim.loop.new_pipe(false)
+	local stdout = vim.loop.new_pipe(false)
+	local stderr = vim.loop.new_pipe(false)
+
+	local handle, pid_or_err
+	handle, pid_or_err = vim.loop.spawn(python_path, {
+		args = { script_path },
+		stdio = { stdin, stdout, stderr },
+	}, function(code, signal)
+		log_scheduled("info", string.format("Token counter daemon exited (code %d, signal %d)", code, signal))
+		-- Only reset if this is still the active process (not one already replaced by a restart)
+		if state.handle == handle then
+			reset("Token counter daemon exited")
+		elseif not handle:is_closing() then
+			handle:close()
+		end
+	end)
+
+	if not handle then
+		close_pipe(stdin)
+		close_pipe(stdout)
+		close_pipe(stderr)
+		return false, "Failed to start token counter daemon: " .. tostring(pid_or_err)
+	end
+
+	state.handle = handle
+	state.pid = pid_or_err
+	state.stdin = stdin
+	state.stdout = stdout
+	state.stderr = stderr
+	state.read_buffer = ""
+	state.env = env
+
+	stdout:read_start(on_stdout)
+	stderr:read_start(on_stderr)
+
+	log_scheduled("info", "Token counter daemon started (pid " .. tostring(pid_or_err) .. ")")
+	return true, nil
+end
+
+--- Stop the daemon, failing any in-flight requests
+function M.stop()
+	if not state.handle then
+		return
+	end
+
+	local handle = state.handle
+	-- Closing stdin lets the daemon exit cleanly; kill in case it is mid-request
+	close_pipe(state.stdin)
+	pcall(function()
+		handle:kill("sigterm")
+	end)
+	reset("Token counter daemon stopped")
+end
+
+--- Send a raw request to the daemon
+--- @param payload table Request fields (provider, model, text, options)
+--- @param callback function Callback receiving (response, error), always scheduled
+function M.request(payload, callback)
+	local ok, err = M.start()
+	if not ok then
+		vim.schedule(function()
+			callback(nil, err)
+		end)
+		return
+	end
+
+	state.next_id = state.next_id + 1
+	payload.id = state.next_id
+	state.pending[payload.id] = callback
+
+	local encoded_ok, encoded = pcall(vim.json.encode, payload)
+	if not encoded_ok then
+		state.pending[payload.id] = nil
+		vim.schedule(function()
+			callback(nil, "Failed to encode request: " .. tostring(encoded))
+		end)
+		return
+	end
+
+	state.stdin:write(encode_frame(encoded))
+end
+
+--- Send a request and block until its response arrives
+--- @param payload table Request fields (provider, model, text, options)
+--- @return table|nil response Decoded response, or nil on error
+--- @return string|nil error Error message if the request failed
+function M.request_sync(payload)
+	local done, response, error = false, nil, nil
+
+	M.request(payload, function(result, err)
+		done = true
+		response = result
+		error = err
+	end)
+
+	if not vim.wait(DAEMON_CONFIG.sync_timeout, function()
+		return done
+	end, 5) then
+		if payload.id then
+			state.pending[payload.id] = nil
+		end
+		return nil, "Token counter daemon timed out"
+	end
+
+	return response, error
+end
+
+--- Load counters and tokenizers in the background so the first count is fast
+--- @param targets table[] List of { provider = string, model = string|nil }
+function M.prewarm(targets)
+	if #targets == 0 then
+		return
+	end
+
+	M.request({ op = "prewarm", targets = targets }, function(_, error)
+		if error then
+			require("token-count.log").info("Token counter daemon prewarm failed: " .. error)
+		end
+	end)
+end
+
+--- Character length above which the daemon estimates counts instead of tokenizing in full
+--- @return number|nil threshold nil when exact counts are required
+local function estimate_threshold()
+	local config = require("token-count.config").get()
+	if config.exact_counts or not config.exact_threshold then
+		return nil
+	end
+	return config.exact_threshold
+end
+
+--- Build a count request payload
+--- Large texts for chunkable providers are sent as "count_chunked" so the daemon only
+--- re-tokenizes the line-aligned chunks that changed since the last count
+local function count_payload(provider, model, text, options)
+	local chunked = CHUNKABLE_PROVIDERS[provider] and #text >= DAEMON_CONFIG.chunked_min_size
+	return {
+		op = chunked and "count_chunked" or nil,
+		provider = provider,
+		model = model,
+		text = text,
+		options = options,
+		estimate_above = estimate_threshold(),
+	}
+end
+
+--- Validate the count field of a daemon response
+--- @return number|nil token_count
+--- @return string|nil error
+local function extract_count(response, error)
+	if error then
+		return nil, error
+	end
+	if type(response.count) ~= "number" then
+		return nil, "Invalid token count returned: " .. tostring(response.count)
+	end
+	return response.count, nil
+end
+
+--- Count tokens asynchronously through the daemon
+--- @param provider string Provider name ("tiktoken", "deepseek", "tokencost", ...)
+--- @param model string Model or encoding name understood by the provider
+--- @param text string The text to count tokens for
+--- @param callback function Callback receiving (token_count, error)
+--- @param options table|nil Provider-specific options
+function M.count_async(provider, model, text, callback, options)
+	M.request(count_payload(provider, model, text, options), function(response, error)
+		callback(extract_count(response, error))
+	end)
+end
+
+--- Count tokens synchronously through the daemon (blocks Neovim)
+--- @param provider string Provider name ("tiktoken", "deepseek", "tokencost", ...)
+--- @param model string Model or encoding name understood by the provider
+--- @param text string The text to count tokens for
+--- @param options table|nil Provider-specific options
+--- @return number|nil token_count The number of tokens, or nil on error
+--- @return string|nil error Error message if counting failed
+function M.count_sync(provider, model, text, options)
+	return extract_count(M.request_sync(count_payload(provider, model, text, options)))
+end
+
+--- Count tokens for several texts in one daemon round-trip
+--- @param provider string Provider name ("tiktoken", "deepseek", "tokencost", ...)
+--- @param model string Model or encoding name understood by the provider
+--- @param texts string[] The texts to count tokens for
+--- @param callback function Callback receiving (token_counts, error), counts in input order
+--- @param options table|nil Provider-specific options
+function M.count_batch_async(provider, model, texts, callback, options)
+	if #texts == 0 then
+		vim.schedule(function()
+			callback({}, nil)
+		end)
+		return
+	end
+
+	local payload = {
+		op = "batch",
+		provider = provider,
+		model = model,
+		texts = texts,
+		options = options,
+		estimate_above = estimate_threshold(),
+	}
+
+	M.request(payload, function(response, error)
+		if error then
+			callback(nil, error)
+		elseif type(response.counts) ~= "table" or #response.counts ~= #texts then
+			callback(nil, "Invalid token counts returned for batch")
+		else
+			callback(response.counts, nil)
+		end
+	end)
+end
+
+return M
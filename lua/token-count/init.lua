@@ -164,6 +164,12 @@ function M.cleanup()
 		cache.cleanup()
 	end
 
+	-- Stop the persistent token counter process
+	local daemon_ok, daemon = pcall(require, "token-count.daemon")
+	if daemon_ok then
+		daemon.stop()
+	end
+
 	-- Reset plugin state
 	_setup_complete = false
 
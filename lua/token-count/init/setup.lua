@@ -1,5 +1,22 @@
 local M = {}
 
+--- Start the counter daemon and load the configured model's tokenizer in the background
+--- Skipped until the virtual environment exists, since it would only fail before then
+function M.prewarm_daemon()
+	local venv = require("token-count.venv")
+	if not venv.venv_exists() then
+		return
+	end
+
+	local config = require("token-count.config").get()
+	local model_config = require("token-count.models.utils").get_model(config.model)
+	if not model_config then
+		return
+	end
+
+	require("token-count.daemon").prewarm({ { provider = model_config.provider, model = model_config.encoding } })
+end
+
 function M.initialize_plugin(opts)
 
 	-- Log successful setup
@@ -9,6 +26,8 @@ function M.initialize_plugin(opts)
 	-- Note: Virtual environment setup is now deferred until first use
 	-- to avoid blocking plugin startup. The environment will be set up
 	-- automatically when token counting is first attempted.
+	-- The counter daemon is started once startup has finished, if the venv already exists.
+	vim.schedule(M.prewarm_daemon)
 end
 
 return M
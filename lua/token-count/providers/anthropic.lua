@@ -16,9 +16,6 @@ function M.count_tokens_async(text, model_name, callback)
 		return
 	end
 
-	-- Get the path to the anthropic counter script
-	local script_path = vim.fn.fnamemodify(debug.getinfo(1, "S").source:sub(2), ":p:h") .. "/anthropic_counter.py"
-
 	-- Use the plugin's managed virtual environment
 	local venv = require("token-count.venv")
 
@@ -38,30 +35,59 @@ function M.count_tokens_async(text, model_name, callback)
 		return
 	end
 
-	local python_path = venv.get_python_path()
-	local cmd = { python_path, script_path, model_name, text }
-
-	-- Use vim.system instead of jobstart to avoid fast event context issues
-	vim.system(cmd, { text = true }, function(result)
-		-- Schedule callback to avoid fast event context restrictions
-		vim.schedule(function()
-			if result.code == 0 then
-				local stdout = result.stdout and result.stdout:gsub("%s+$", "") or ""
-				if stdout ~= "" then
-					local token_count = tonumber(stdout)
-					if token_count then
-						callback(token_count, nil)
-					else
-						callback(nil, "Invalid token count returned: " .. stdout)
-					end
-				else
-					callback(nil, "No output from Anthropic")
-				end
-			else
-				local error_msg = result.stderr and result.stderr:gsub("%s+$", "") or "Unknown error"
-				callback(nil, "Anthropic error: " .. error_msg)
-			end
-		end)
+	local daemon = require("token-count.daemon")
+	daemon.count_async("anthropic", model_name, text, function(token_count, error)
+		if error then
+			callback(nil, "Anthropic error: " .. error)
+		else
+			callback(token_count, nil)
+		end
+	end)
+end
+
+--- Count tokens for several texts with concurrent Anthropic API requests
+--- @param texts string[] The texts to count tokens for
+--- @param model_name string The Anthropic model name
+--- @param callback function Callback receiving (token_counts, error), counts in input order
+function M.count_tokens_batch_async(texts, model_name, callback)
+	local venv = require("token-count.venv")
+	local venv_utils = require("token-count.venv.utils")
+	local python_available, _ = venv_utils.check_python_available()
+	if not python_available then
+		callback(nil, "Python not available")
+		return
+	end
+
+	local status = venv.get_status()
+	if not status.ready then
+		callback(nil, "Virtual environment not ready. Run :TokenCountVenvSetup to initialize.")
+		return
+	end
+
+	-- Oversized texts get the same estimate as single counts; the rest go to the API together
+	local token_counts = {}
+	local api_texts = {}
+	local api_indices = {}
+	for i, text in ipairs(texts) do
+		if #text > 50000 then
+			token_counts[i] = math.floor(#text / 4)
+		else
+			table.insert(api_texts, text)
+			table.insert(api_indices, i)
+		end
+	end
+
+	local daemon = require("token-count.daemon")
+	daemon.count_batch_async("anthropic", model_name, api_texts, function(api_counts, error)
+		if error then
+			callback(nil, "Anthropic error: " .. error)
+			return
+		end
+
+		for j, i in ipairs(api_indices) do
+			token_counts[i] = api_counts[j]
+		end
+		callback(token_counts, nil)
 	end)
 end
 
@@ -80,8 +106,6 @@ function M.count_tokens_sync(text, model_name)
 		return estimated_tokens, nil
 	end
 
-	local script_path = vim.fn.fnamemodify(debug.getinfo(1, "S").source:sub(2), ":p:h") .. "/anthropic_counter.py"
-
 	-- Use the plugin's managed virtual environment
 	local venv = require("token-count.venv")
 
@@ -98,19 +122,12 @@ function M.count_tokens_sync(text, model_name)
 		return nil, "Virtual environment not ready. Run :TokenCountVenvSetup to initialize."
 	end
 
-	local python_path = venv.get_python_path()
-	local cmd = { python_path, script_path, model_name, text }
-	local result = vim.system(cmd, { text = true }):wait()
-
-	if result.code == 0 then
-		local token_count = tonumber(result.stdout:gsub("%s+", ""))
-		if token_count then
-			return token_count, nil
-		else
-			return nil, "Invalid token count returned: " .. result.stdout
-		end
+	local daemon = require("token-count.daemon")
+	local token_count, error = daemon.count_sync("anthropic", model_name, text)
+	if token_count then
+		return token_count, nil
 	else
-		return nil, "Anthropic error: " .. (result.stderr or "Unknown error")
+		return nil, "Anthropic error: " .. error
 	end
 end
 
@@ -4,15 +4,94 @@ Token counting script for token-count.nvim using Anthropic API
 Accepts text via stdin and model name as argument, returns token count.
 """
 
+import asyncio
 import os
 import sys
+from typing import List
 
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
+
+API_KEY_VARIABLE = "ANTHROPIC_API_KEY"
+# Prebuilt so a missing key is reported without formatting on every failure
+MISSING_API_KEY_MESSAGE = "Error: ANTHROPIC_API_KEY environment variable not set\n"
+
+
+class MissingApiKeyError(RuntimeError):
+    """Raised when the API key environment variable is not set."""
+
+    # Reported by the daemon as {"code": "no_api_key", "detail": API_KEY_VARIABLE}
+    error_code = "no_api_key"
+
+
+# Clients are shared for the life of the process so their pooled HTTP connections
+# (and TLS sessions) stay alive between counts
+_client = None
+_async_client = None
+# Connections of the async client are bound to the loop they were opened on
+_event_loop = None
+
+
+def _get_api_key() -> str:
+    api_key = os.getenv(API_KEY_VARIABLE)
+    if not api_key:
+        raise MissingApiKeyError(API_KEY_VARIABLE)
+    return api_key
+
+
+def _get_client() -> Anthropic:
+    global _client
+    if _client is None:
+        _client = Anthropic(api_key=_get_api_key())
+    return _client
+
+
+def _get_async_client() -> AsyncAnthropic:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncAnthropic(api_key=_get_api_key())
+    return _async_client
+
+
+def _run(coro):
+    """Run a coroutine on the module's persistent event loop."""
+    global _event_loop
+    if _event_loop is None:
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop.run_until_complete(coro)
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """Count tokens for text using Anthropic's token counting API."""
+    client = _get_client()
+
+    # Use the beta token counting feature
+    response = client.beta.messages.count_tokens(
+        model=model_name, messages=[{"role": "user", "content": text}]
+    )
+
+    return response.input_tokens
+
+
+async def _count_tokens_async(client: AsyncAnthropic, text: str, model_name: str) -> int:
+    response = await client.beta.messages.count_tokens(
+        model=model_name, messages=[{"role": "user", "content": text}]
+    )
+    return response.input_tokens
+
+
+def count_tokens_batch(texts: List[str], model_name: str) -> List[int]:
+    """Count tokens for several texts with concurrent API requests."""
+    client = _get_async_client()
+
+    async def gather_counts():
+        return await asyncio.gather(*[_count_tokens_async(client, text, model_name) for text in texts])
+
+    return list(_run(gather_counts()))
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: anthropic_counter.py <model_name> <text>", file=sys.stderr)
+    if len(sys.argv) != 2:
+        print("Usage: anthropic_counter.py <model_name> < text", file=sys.stderr)
         print(
             "Available models: claude-3-haiku-20240307, claude-3-sonnet-20240229, claude-3-opus-20240229, claude-3-5-sonnet-20240620",
             file=sys.stderr,
@@ -20,30 +99,16 @@ def main():
         sys.exit(1)
 
     model_name = sys.argv[1]
-    text = sys.argv[2]
+    text = sys.stdin.buffer.read().decode("utf-8")
 
     # Check for API key
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("Error: ANTHROPIC_API_KEY environment variable not set", file=sys.stderr)
-        sys.exit(1)
-
-    # Initialize Anthropic client
-    try:
-        client = Anthropic(api_key=api_key)
-    except Exception as e:
-        print(f"Error initializing Anthropic client: {e}", file=sys.stderr)
+    if not os.getenv(API_KEY_VARIABLE):
+        sys.stderr.write(MISSING_API_KEY_MESSAGE)
         sys.exit(1)
 
     # Count tokens using Anthropic's API
     try:
-        # Use the beta token counting feature
-        response = client.beta.messages.count_tokens(
-            model=model_name, messages=[{"role": "user", "content": text}]
-        )
-
-        # Extract token count from response
-        token_count = response.input_tokens
+        token_count = count_tokens(text, model_name)
 
         # Output just the number (for easy parsing in Lua)
         print(token_count)
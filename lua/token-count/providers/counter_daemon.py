@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Long-lived token counting daemon for token-count.nvim
+Reads JSON requests on stdin and writes one JSON response per request to stdout,
+keeping tokenizers loaded between requests. Every message is framed as a 4-byte
+big-endian length followed by that many bytes of UTF-8 JSON.
+
+Request:  {"id": 1, "provider": "tiktoken", "model": "cl100k_base", "text": "...", "options": {}}
+Response: {"id": 1, "count": 42} or {"id": 1, "error": "..."} or {"id": 1, "code": "no_api_key", "detail": "..."}
+
+Batch:    {"id": 2, "op": "batch", "provider": "tiktoken", "model": "cl100k_base", "texts": ["...", "..."]}
+Response: {"id": 2, "counts": [42, 7]}
+
+Chunked:  {"id": 3, "op": "count_chunked", "provider": "tiktoken", "model": "cl100k_base", "text": "..."}
+Response: {"id": 3, "count": 4242}
+
+Texts longer than a count or batch request's optional "estimate_above" (characters) are
+estimated from exactly counted samples instead; such single counts add "estimated": true.
+
+Prewarm:  {"id": 4, "op": "prewarm", "targets": [{"provider": "tiktoken", "model": "o200k_base"}]}
+Response: {"id": 4, "warmed": 1}
+"""
+
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import struct
+import sys
+from collections import OrderedDict
+
+# orjson parses and serializes multi-megabyte buffers several times faster than json
+try:
+    import orjson
+
+    loads = orjson.loads
+    dumps = orjson.dumps
+except ImportError:
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+# Counter modules live next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Provider name -> counter module implementing count_tokens(text, model, **options)
+COUNTERS = {
+    "tiktoken": "tiktoken_counter",
+    "deepseek": "deepseek_counter",
+    "tokencost": "tokencost_counter",
+    "anthropic": "anthropic_counter",
+    "gemini": "gemini_counter",
+}
+
+# Counter modules imported so far, populated lazily on first use of each provider
+LOADED_COUNTERS = {}
+
+# Providers whose counts are a pure function of (model, options, text) and safe to memoize,
+# except where the counter sends them to an official API (see counts_are_stable)
+CACHEABLE_PROVIDERS = {"tiktoken", "deepseek", "tokencost"}
+
+# (provider, model, options, blake2b(text)) -> token count, in least-recently-used order
+COUNT_CACHE = OrderedDict()
+COUNT_CACHE_SIZE = 512
+
+# Same keying for the line-aligned chunks of large texts counted with op "count_chunked"
+CHUNK_CACHE = OrderedDict()
+CHUNK_CACHE_SIZE = 4096
+CHUNK_SIZE = 4096
+
+# Texts over a request's "estimate_above" are estimated from this many evenly spaced
+# windows of ESTIMATE_WINDOW_SIZE characters, counted exactly and scaled by length
+ESTIMATE_WINDOWS = 32
+ESTIMATE_WINDOW_SIZE = 1024
+
+# Worker processes for counters that set GIL_BOUND, so their batch misses use several cores.
+# Started lazily with "spawn": forking a process that runs tokenizer threads is unsafe
+WORKER_POOL = None
+WORKER_POOL_SIZE = min(4, os.cpu_count() or 1)
+# Smaller batches are cheaper to count in-process than to ship to the workers
+WORKER_POOL_MIN_CHARS = 65536
+
+# Exception class name -> error code, for API failures that tend to repeat across many
+# requests (bad key, rate limits, no network) and need no per-failure message
+ERROR_CODES = {
+    "AuthenticationError": "bad_api_key",
+    "PermissionDeniedError": "bad_api_key",
+    "RateLimitError": "rate_limited",
+    "APIConnectionError": "network_error",
+    "APITimeoutError": "network_error",
+    "ConnectError": "network_error",
+    "ConnectTimeout": "network_error",
+}
+
+# Frame header: payload length as an unsigned 32-bit big-endian integer
+FRAME_HEADER = struct.Struct("!I")
+
+
+def get_counter(provider: str):
+    """Import (once) and return the counter module for a provider."""
+    counter = LOADED_COUNTERS.get(provider)
+    if counter is None:
+        module_name = COUNTERS.get(provider)
+        if module_name is None:
+            raise ValueError(f"Unknown provider '{provider}'")
+        counter = importlib.import_module(module_name)
+        LOADED_COUNTERS[provider] = counter
+    return counter
+
+
+def text_digest(text: str) -> bytes:
+    """Hash text for cache keys; far cheaper than re-running BPE over it."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def cache_key(provider: str, model: str, text: str, options: dict) -> tuple:
+    """Build the COUNT_CACHE key for a count request."""
+    return (provider, model, tuple(sorted(options.items())), text_digest(text))
+
+
+def cache_store(key: tuple, count: int, cache: OrderedDict = COUNT_CACHE, size: int = COUNT_CACHE_SIZE):
+    """Remember a count, evicting the least recently used entry when full."""
+    cache[key] = count
+    if len(cache) > size:
+        cache.popitem(last=False)
+
+
+def cache_lookup(key: tuple, cache: OrderedDict = COUNT_CACHE):
+    """Return a cached count (marking it recently used), or None."""
+    count = cache.get(key)
+    if count is not None:
+        cache.move_to_end(key)
+    return count
+
+
+def split_chunks(text: str) -> list:
+    """Split text into ~CHUNK_SIZE pieces that end after a line break.
+
+    A piece ends after the last line break before the next non-whitespace
+    character: runs of whitespace ending in a line break are a single pre-token,
+    and the indentation that follows them starts the next piece. A piece does not
+    end right before "/" (which o200k_base lets punctuation absorb). No
+    pre-tokenizer merges across such a boundary, so the chunk counts add up to
+    the count of the whole text.
+    """
+    chunks = []
+    start = 0
+    length = len(text)
+    search = CHUNK_SIZE
+    while start < length:
+        newline = text.find("\n", start + search)
+        if newline == -1:
+            chunks.append(text[start:])
+            break
+        line_start = newline + 1
+        while line_start < length and text[line_start].isspace():
+            line_start += 1
+        if line_start == length:
+            chunks.append(text[start:])
+            break
+        end = max(text.rfind("\n", newline, line_start), text.rfind("\r", newline, line_start)) + 1
+        if end == line_start and text[end] == "/":
+            search = end - start
+            continue
+        chunks.append(text[start:end])
+        start = end
+        search = CHUNK_SIZE
+    return chunks
+
+
+def init_worker():
+    """Keep stray prints from worker processes off the daemon's protocol stream."""
+    sys.stdout = sys.stderr
+
+
+def count_in_worker(provider: str, model: str, text: str, options: dict) -> int:
+    """Count one text inside a pool worker."""
+    return get_counter(provider).count_tokens(text, model, **options)
+
+
+def get_worker_pool():
+    """Start (once) and return the worker process pool."""
+    global WORKER_POOL
+    if WORKER_POOL is None:
+        WORKER_POOL = multiprocessing.get_context("spawn").Pool(WORKER_POOL_SIZE, initializer=init_worker)
+    return WORKER_POOL
+
+
+def count_many(provider: str, model: str, texts: list, options: dict) -> list:
+    """Count texts with the counter's batch support, worker processes, or a plain loop."""
+    counter = get_counter(provider)
+    if (
+        getattr(counter, "GIL_BOUND", False)
+        and WORKER_POOL_SIZE > 1
+        and len(texts) > 1
+        and sum(len(text) for text in texts) >= WORKER_POOL_MIN_CHARS
+    ):
+        return get_worker_pool().starmap(count_in_worker, [(provider, model, text, options) for text in texts])
+
+    count_batch = getattr(counter, "count_tokens_batch", None)
+    if count_batch is not None:
+        return count_batch(texts, model, **options)
+    return [counter.count_tokens(text, model, **options) for text in texts]
+
+
+def uses_official_counter(provider: str, model: str, options: dict) -> bool:
+    """Check whether the provider's counter sends counts for model to an official API."""
+    uses_official = getattr(get_counter(provider), "uses_official_counter", None)
+    return uses_official is not None and uses_official(model, **options)
+
+
+def counts_are_stable(provider: str, model: str, options: dict) -> bool:
+    """Check whether counts can be memoized.
+
+    Official API counters fall back to a local count when a request fails, and that
+    fallback must not be remembered in place of the API's answer.
+    """
+    return provider in CACHEABLE_PROVIDERS and not uses_official_counter(provider, model, options)
+
+
+def count_cached(provider: str, model: str, text: str, options: dict) -> int:
+    """Count tokens, reusing the previous result for identical content."""
+    counter = get_counter(provider)
+    if not counts_are_stable(provider, model, options):
+        return counter.count_tokens(text, model, **options)
+
+    key = cache_key(provider, model, text, options)
+    count = cache_lookup(key)
+    if count is None:
+        count = counter.count_tokens(text, model, **options)
+        cache_store(key, count)
+    return count
+
+
+def count_batch_cached(
+    provider: str, model: str, texts: list, options: dict, cache: OrderedDict = COUNT_CACHE, size: int = COUNT_CACHE_SIZE
+) -> list:
+    """Count tokens for many texts, tokenizing only those not already cached."""
+    cacheable = counts_are_stable(provider, model, options)
+
+    counts = [None] * len(texts)
+    keys = [None] * len(texts)
+    missing = []
+    # Cache key -> index of the first missing text with that content, so repeated
+    # texts in one batch (unchanged chunks, duplicate buffers) are tokenized once
+    first_missing = {}
+    duplicates = []
+    for i, text in enumerate(texts):
+        if cacheable:
+            keys[i] = cache_key(provider, model, text, options)
+            counts[i] = cache_lookup(keys[i], cache)
+            if counts[i] is None:
+                if keys[i] in first_missing:
+                    duplicates.append(i)
+                    continue
+                first_missing[keys[i]] = i
+        if counts[i] is None:
+            missing.append(i)
+
+    if missing:
+        missing_counts = count_many(provider, model, [texts[i] for i in missing], options)
+
+        for i, count in zip(missing, missing_counts):
+            counts[i] = count
+            if cacheable:
+                cache_store(keys[i], count, cache, size)
+
+    for i in duplicates:
+        counts[i] = counts[first_missing[keys[i]]]
+
+    return counts
+
+
+def count_chunked_cached(provider: str, model: str, text: str, options: dict) -> int:
+    """Count a large text chunk by chunk so an edit only re-tokenizes the chunks it touched."""
+    chunks = split_chunks(text)
+    return sum(count_batch_cached(provider, model, chunks, options, CHUNK_CACHE, CHUNK_CACHE_SIZE))
+
+
+def should_estimate(provider: str, model: str, text: str, options: dict, estimate_above) -> bool:
+    """Check whether a text is large enough to estimate rather than count in full.
+
+    Only local tokenizers are sampled; counts that go to an official API stay whole,
+    both to keep that opt-in exact and to avoid one API call per sample window.
+    """
+    if not estimate_above or provider not in CACHEABLE_PROVIDERS:
+        return False
+    if len(text) <= max(estimate_above, ESTIMATE_WINDOWS * ESTIMATE_WINDOW_SIZE):
+        return False
+    return not uses_official_counter(provider, model, options)
+
+
+def estimate_count(provider: str, model: str, text: str, options: dict) -> int:
+    """Estimate a very large text's count from the token density of evenly spaced samples."""
+    step = (len(text) - ESTIMATE_WINDOW_SIZE) // (ESTIMATE_WINDOWS - 1)
+    windows = [text[i * step : i * step + ESTIMATE_WINDOW_SIZE] for i in range(ESTIMATE_WINDOWS)]
+    sample_count = sum(count_batch_cached(provider, model, windows, options, CHUNK_CACHE, CHUNK_CACHE_SIZE))
+    return round(sample_count * len(text) / (ESTIMATE_WINDOWS * ESTIMATE_WINDOW_SIZE))
+
+
+def count_batch_estimating(provider: str, model: str, texts: list, options: dict, estimate_above) -> list:
+    """Count a batch, estimating the texts longer than estimate_above."""
+    estimated = [should_estimate(provider, model, text, options, estimate_above) for text in texts]
+    exact_counts = iter(
+        count_batch_cached(provider, model, [text for text, est in zip(texts, estimated) if not est], options)
+    )
+    return [
+        estimate_count(provider, model, text, options) if est else next(exact_counts)
+        for text, est in zip(texts, estimated)
+    ]
+
+
+def prewarm(targets: list) -> int:
+    """Import counters and build tokenizers ahead of the first count."""
+    for target in targets:
+        counter = get_counter(target.get("provider"))
+        warm = getattr(counter, "warm", None)
+        if warm is not None:
+            warm(target.get("model"))
+    return len(targets)
+
+
+def dispatch(req: dict) -> dict:
+    """Handle a single request and build its response."""
+    options = req.get("options") or {}
+    provider = req.get("provider")
+    model = req.get("model")
+    estimate_above = req.get("estimate_above")
+    if req.get("op") == "batch":
+        counts = count_batch_estimating(provider, model, req.get("texts") or [], options, estimate_above)
+        return {"counts": counts}
+    if req.get("op") == "prewarm":
+        return {"warmed": prewarm(req.get("targets") or [])}
+
+    text = req["text"]
+    if should_estimate(provider, model, text, options, estimate_above):
+        return {"count": estimate_count(provider, model, text, options), "estimated": True}
+    if req.get("op") == "count_chunked":
+        return {"count": count_chunked_cached(provider, model, text, options)}
+
+    count = count_cached(provider, model, text, options)
+    return {"count": count}
+
+
+def error_response(error: Exception) -> dict:
+    """Describe a failed request, as a short error code when the failure is a known one."""
+    code = getattr(error, "error_code", None)
+    if code is not None:
+        return {"code": code, "detail": error.args[0] if error.args else None}
+    code = ERROR_CODES.get(type(error).__name__)
+    if code is not None:
+        return {"code": code}
+    return {"error": str(error) or error.__class__.__name__}
+
+
+def parse_request(body: bytes) -> dict:
+    """Decode a request body, replacing any bytes that are not valid UTF-8."""
+    try:
+        return loads(body)
+    except ValueError:
+        # Files read from disk may be Latin-1 or binary-ish; count them with U+FFFD
+        # in place of the invalid bytes rather than failing the request
+        return json.loads(body.decode("utf-8", errors="replace"))
+
+
+def read_frame(stream):
+    """Read one length-prefixed message, or return None at end of input."""
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return body
+
+
+def write_frame(stream, body: bytes):
+    """Write one length-prefixed message."""
+    stream.write(FRAME_HEADER.pack(len(body)) + body)
+    stream.flush()
+
+
+def main():
+    # Tokenizer libraries occasionally print to stdout; keep the protocol stream clean
+    out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+
+    while True:
+        body = read_frame(sys.stdin.buffer)
+        if body is None:
+            break
+
+        req_id = None
+        try:
+            req = parse_request(body)
+            req_id = req.get("id")
+            response = dispatch(req)
+        except Exception as e:
+            response = error_response(e)
+
+        response["id"] = req_id
+        write_frame(out, dumps(response))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,6 @@ local function get_cleanup()
 end
 
 function M.count_tokens_async(text, model_name, callback)
-	-- Get the path to the deepseek counter script
-	local script_path = vim.fn.fnamemodify(debug.getinfo(1, "S").source:sub(2), ":p:h") .. "/deepseek_counter.py"
-
 	-- Use the plugin's managed virtual environment
 	local venv = require("token-count.venv")
 
@@ -28,30 +25,42 @@ function M.count_tokens_async(text, model_name, callback)
 		return
 	end
 
-	local python_path = venv.get_python_path()
-	local cmd = { python_path, script_path, text }
-
-	-- Use vim.system instead of jobstart to avoid fast event context issues
-	vim.system(cmd, { text = true }, function(result)
-		-- Schedule callback to avoid fast event context restrictions
-		vim.schedule(function()
-			if result.code == 0 then
-				local stdout = result.stdout and result.stdout:gsub("%s+$", "") or ""
-				if stdout ~= "" then
-					local token_count = tonumber(stdout)
-					if token_count then
-						callback(token_count, nil)
-					else
-						callback(nil, "Invalid token count returned: " .. stdout)
-					end
-				else
-					callback(nil, "No output from DeepSeek tokenizer")
-				end
-			else
-				local error_msg = result.stderr and result.stderr:gsub("%s+$", "") or "Unknown error"
-				callback(nil, "DeepSeek tokenizer error: " .. error_msg)
-			end
-		end)
+	local daemon = require("token-count.daemon")
+	daemon.count_async("deepseek", model_name, text, function(token_count, error)
+		if error then
+			callback(nil, "DeepSeek tokenizer error: " .. error)
+		else
+			callback(token_count, nil)
+		end
+	end)
+end
+
+--- Count tokens for several texts in a single daemon request
+--- @param texts string[] The texts to count tokens for
+--- @param model_name string The model name (unused for DeepSeek, all use same tokenizer)
+--- @param callback function Callback receiving (token_counts, error), counts in input order
+function M.count_tokens_batch_async(texts, model_name, callback)
+	local venv = require("token-count.venv")
+	local venv_utils = require("token-count.venv.utils")
+	local python_available, _ = venv_utils.check_python_available()
+	if not python_available then
+		callback(nil, "Python not available")
+		return
+	end
+
+	local status = venv.get_status()
+	if not status.ready then
+		callback(nil, "Virtual environment not ready. Run :TokenCountVenvSetup to initialize.")
+		return
+	end
+
+	local daemon = require("token-count.daemon")
+	daemon.count_batch_async("deepseek", model_name, texts, function(token_counts, error)
+		if error then
+			callback(nil, "DeepSeek tokenizer error: " .. error)
+		else
+			callback(token_counts, nil)
+		end
 	end)
 end
 
@@ -61,8 +70,6 @@ end
 --- @return number|nil token_count The number of tokens, or nil on error
 --- @return string|nil error Error message if counting failed
 function M.count_tokens_sync(text, model_name)
-	local script_path = vim.fn.fnamemodify(debug.getinfo(1, "S").source:sub(2), ":p:h") .. "/deepseek_counter.py"
-
 	-- Use the plugin's managed virtual environment
 	local venv = require("token-count.venv")
 
@@ -79,20 +86,12 @@ function M.count_tokens_sync(text, model_name)
 		return nil, "Virtual environment not ready. Run :TokenCountVenvSetup to initialize."
 	end
 
-	local python_path = venv.get_python_path()
-	local cmd = { python_path, script_path, text }
-	local result = vim.system(cmd, { text = true }):wait()
-
-	if result.code == 0 then
-		local cleaned_output = result.stdout:gsub("%s+", "")
-		local token_count = tonumber(cleaned_output)
-		if token_count then
-			return token_count, nil
-		else
-			return nil, "Invalid token count returned: " .. cleaned_output
-		end
+	local daemon = require("token-count.daemon")
+	local token_count, error = daemon.count_sync("deepseek", model_name, text)
+	if token_count then
+		return token_count, nil
 	else
-		return nil, "DeepSeek tokenizer error: " .. (result.stderr or "Unknown error")
+		return nil, "DeepSeek tokenizer error: " .. error
 	end
 end
 
@@ -1,25 +1,56 @@
 #!/usr/bin/env python3
 """
 Token counting script for token-count.nvim using DeepSeek tokenizer
-Accepts text and returns token count using DeepSeek's official tokenizer.
+Accepts text via stdin and returns token count using DeepSeek's official tokenizer.
 """
 
+import os
 import sys
+from typing import List, Optional
 
+import deepseek_tokenizer
 from deepseek_tokenizer import ds_token
 
+# HuggingFace tokenizers (Rust) loading the same tokenizer.json: the reference implementation of
+# that file and a managed venv dependency. ds_token is only a fallback for venvs where it could
+# not be installed; its counts differ on most code, so they are not interchangeable
+try:
+    from tokenizers import Tokenizer
+
+    _fast_tokenizer = Tokenizer.from_file(os.path.join(os.path.dirname(deepseek_tokenizer.__file__), "tokenizer.json"))
+except Exception:
+    _fast_tokenizer = None
+
+# Without the native tokenizer, counting holds the GIL; the daemon spreads batches over processes
+GIL_BOUND = _fast_tokenizer is None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """Count tokens for text using the DeepSeek tokenizer (shared by all DeepSeek models)."""
+    if _fast_tokenizer is not None:
+        return len(_fast_tokenizer.encode(text))
+    return len(ds_token.encode(text))
+
+
+def count_tokens_batch(texts: List[str], model_name: Optional[str] = None) -> List[int]:
+    """Count tokens for several texts in one call."""
+    if _fast_tokenizer is not None:
+        # Encoded in parallel native threads, without offsets the counts do not need
+        encode_batch = getattr(_fast_tokenizer, "encode_batch_fast", _fast_tokenizer.encode_batch)
+        return [len(encoding) for encoding in encode_batch(texts)]
+    # The fallback tokenizer is pure Python and holds the GIL, so threads would not run in parallel
+    return [count_tokens(text) for text in texts]
+
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: deepseek_counter.py <text>", file=sys.stderr)
+    if len(sys.argv) != 1:
+        print("Usage: deepseek_counter.py < text", file=sys.stderr)
         sys.exit(1)
 
-    text = sys.argv[1]
+    text = sys.stdin.buffer.read().decode("utf-8")
 
     try:
-        # Encode text using DeepSeek tokenizer
-        tokens = ds_token.encode(text)
-        token_count = len(tokens)
+        token_count = count_tokens(text)
 
         print(token_count)
 
@@ -29,4 +60,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -4,15 +4,86 @@ Token counting script for token-count.nvim using Google GenAI
 Accepts text via stdin and model name as argument, returns token count.
 """
 
+import asyncio
 import os
 import sys
+from typing import List
 
 from google import genai
 
+API_KEY_VARIABLE = "GOOGLE_API_KEY"
+# Prebuilt so a missing key is reported without formatting on every failure
+MISSING_API_KEY_MESSAGE = "Error: GOOGLE_API_KEY environment variable not set\n"
+
+
+class MissingApiKeyError(RuntimeError):
+    """Raised when the API key environment variable is not set."""
+
+    # Reported by the daemon as {"code": "no_api_key", "detail": API_KEY_VARIABLE}
+    error_code = "no_api_key"
+
+
+# Shared for the life of the process so connections (and TLS sessions) stay
+# alive between counts; the same client serves sync and async (.aio) calls
+_client = None
+# Connections of the async client are bound to the loop they were opened on
+_event_loop = None
+
+
+def _get_api_key() -> str:
+    api_key = os.getenv(API_KEY_VARIABLE)
+    if not api_key:
+        raise MissingApiKeyError(API_KEY_VARIABLE)
+    return api_key
+
+
+def _get_client() -> genai.Client:
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=_get_api_key())
+    return _client
+
+
+def _run(coro):
+    """Run a coroutine on the module's persistent event loop."""
+    global _event_loop
+    if _event_loop is None:
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop.run_until_complete(coro)
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """Count tokens for text using Google GenAI's count_tokens API."""
+    client = _get_client()
+
+    # Use the count_tokens method on the client
+    response = client.models.count_tokens(
+        model=model_name, contents=[{"parts": [{"text": text}]}]
+    )
+
+    return response.total_tokens
+
+
+async def _count_tokens_async(client: genai.Client, text: str, model_name: str) -> int:
+    response = await client.aio.models.count_tokens(
+        model=model_name, contents=[{"parts": [{"text": text}]}]
+    )
+    return response.total_tokens
+
+
+def count_tokens_batch(texts: List[str], model_name: str) -> List[int]:
+    """Count tokens for several texts with concurrent API requests."""
+    client = _get_client()
+
+    async def gather_counts():
+        return await asyncio.gather(*[_count_tokens_async(client, text, model_name) for text in texts])
+
+    return list(_run(gather_counts()))
+
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: gemini_counter.py <model_name> <text>", file=sys.stderr)
+    if len(sys.argv) != 2:
+        print("Usage: gemini_counter.py <model_name> < text", file=sys.stderr)
         print(
             "Available models: gemini-2.0-flash, gemini-1.5-pro, gemini-1.5-flash",
             file=sys.stderr,
@@ -20,30 +91,16 @@ def main():
         sys.exit(1)
 
     model_name = sys.argv[1]
-    text = sys.argv[2]
+    text = sys.stdin.buffer.read().decode("utf-8")
 
     # Check for API key
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("Error: GOOGLE_API_KEY environment variable not set", file=sys.stderr)
-        sys.exit(1)
-
-    # Initialize Google GenAI client
-    try:
-        client = genai.Client(api_key=api_key)
-    except Exception as e:
-        print(f"Error initializing Google GenAI client: {e}", file=sys.stderr)
+    if not os.getenv(API_KEY_VARIABLE):
+        sys.stderr.write(MISSING_API_KEY_MESSAGE)
         sys.exit(1)
 
     # Count tokens using Google GenAI's count_tokens function
     try:
-        # Use the count_tokens method on the client
-        response = client.models.count_tokens(
-            model=model_name, contents=[{"parts": [{"text": text}]}]
-        )
-
-        # Extract token count from response
-        token_count = response.total_tokens
+        token_count = count_tokens(text, model_name)
 
         # Output just the number (for easy parsing in Lua)
         print(token_count)
@@ -4,27 +4,71 @@ Token counting script for token-count.nvim using tiktoken
 Accepts text via stdin and model encoding as argument, returns token count.
 """
 
+import os
 import sys
+from functools import lru_cache
+from typing import List
 
 import tiktoken
 
 
+@lru_cache(maxsize=8)
+def _get_enc(encoding_name: str) -> tiktoken.Encoding:
+    """Load an encoding once so repeated counts reuse its merges table."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def warm(encoding_name: str):
+    """Build the encoding ahead of the first count."""
+    _get_enc(encoding_name)
+
+
+def count_tokens(text: str, encoding_name: str, allow_special: bool = False) -> int:
+    """Count tokens for text using the given tiktoken encoding.
+
+    Buffer text is encoded as ordinary text, which skips special-token matching;
+    with allow_special, markers like <|endoftext|> count as their special tokens.
+    allowed_special="all" already leaves no disallowed tokens to check for;
+    disallowed_special=() only states that explicitly.
+    """
+    # tiktoken has no count-only entry point: its Rust core always returns the token
+    # list, so take its length directly and let it be freed straight away
+    encoding = _get_enc(encoding_name)
+    if allow_special:
+        return len(encoding.encode(text, allowed_special="all", disallowed_special=()))
+    return len(encoding.encode_ordinary(text))
+
+
+def count_tokens_batch(texts: List[str], encoding_name: str, allow_special: bool = False) -> List[int]:
+    """Count tokens for several texts at once; tiktoken encodes them in parallel threads."""
+    encoding = _get_enc(encoding_name)
+    num_threads = os.cpu_count() or 1
+    if allow_special:
+        batch = encoding.encode_batch(texts, num_threads=num_threads, allowed_special="all", disallowed_special=())
+    else:
+        batch = encoding.encode_ordinary_batch(texts, num_threads=num_threads)
+    return [len(tokens) for tokens in batch]
+
+
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: tiktoken_counter.py <encoding_name> <text>", file=sys.stderr)
+    args = sys.argv[1:]
+    allow_special = "--allow-special" in args
+    if allow_special:
+        args.remove("--allow-special")
+
+    if len(args) != 1:
+        print("Usage: tiktoken_counter.py [--allow-special] <encoding_name> < text", file=sys.stderr)
         print(
             "Available encodings: o200k_base, cl100k_base, p50k_base, p50k_edit, r50k_base, gpt2",
             file=sys.stderr,
         )
         sys.exit(1)
 
-    encoding_name = sys.argv[1]
-    text = sys.argv[2]
+    encoding_name = args[0]
+    text = sys.stdin.buffer.read().decode("utf-8")
 
     try:
-        encoding = tiktoken.get_encoding(encoding_name)
-        tokens = encoding.encode(text)
-        token_count = len(tokens)
+        token_count = count_tokens(text, encoding_name, allow_special)
 
         print(token_count)
 
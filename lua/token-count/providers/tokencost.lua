@@ -5,6 +5,17 @@ local function get_cleanup()
 	return cleanup_ok and cleanup or nil
 end
 
+--- Daemon options selecting official API counters and exactness from the plugin config
+--- @param config table Plugin configuration
+--- @return table options
+local function counter_options(config)
+	return {
+		enable_anthropic = config.enable_official_anthropic_counter and true or false,
+		enable_gemini = config.enable_official_gemini_counter and true or false,
+		exact = config.exact_counts and true or false,
+	}
+end
+
 function M.count_tokens_async(text, model_name, callback)
 	local errors = require("token-count.utils.errors")
 	
@@ -15,9 +26,6 @@ function M.count_tokens_async(text, model_name, callback)
 end
 
 function M._count_tokens_primary(text, model_name, callback)
-	-- Get the path to the tokencost counter script
-	local script_path = vim.fn.fnamemodify(debug.getinfo(1, "S").source:sub(2), ":p:h") .. "/tokencost_counter.py"
-
 	-- Use the plugin's managed virtual environment
 	local venv = require("token-count.venv")
 	local errors = require("token-count.utils.errors")
@@ -47,47 +55,84 @@ function M._count_tokens_primary(text, model_name, callback)
 		return
 	end
 
-	local python_path = venv.get_python_path()
 	local config = require("token-count.config").get()
-	
+	local daemon = require("token-count.daemon")
+
 	-- Pass configuration flags for official providers
-	local enable_anthropic = config.enable_official_anthropic_counter and "true" or "false"
-	local enable_gemini = config.enable_official_gemini_counter and "true" or "false"
-	
-	local cmd = { python_path, script_path, model_name, enable_anthropic, enable_gemini, text }
-
-	-- Use vim.system instead of jobstart to avoid fast event context issues
-	vim.system(cmd, { text = true }, function(result)
-		-- Schedule callback to avoid fast event context restrictions
-		vim.schedule(function()
-			if result.code == 0 then
-				local stdout = result.stdout and result.stdout:gsub("%s+$", "") or ""
-				if stdout ~= "" then
-					local token_count = tonumber(stdout)
-					if token_count then
-						callback(token_count, nil)
-					else
-						callback(nil, "Invalid token count returned: " .. stdout)
-					end
-				else
-					callback(nil, "No output from tokencost")
-				end
-			else
-				local error_msg = result.stderr and result.stderr:gsub("%s+$", "") or "Unknown error"
-				callback(nil, "Tokencost error: " .. error_msg)
-			end
-		end)
+	local options = counter_options(config)
+
+	daemon.count_async("tokencost", model_name, text, function(token_count, error)
+		if error then
+			callback(nil, "Tokencost error: " .. error)
+		else
+			callback(token_count, nil)
+		end
+	end, options)
+end
+
+--- Count tokens for several texts in a single daemon request
+--- @param texts string[] The texts to count tokens for
+--- @param model_name string The model name to use for counting
+--- @param callback function Callback receiving (token_counts, error), counts in input order
+function M.count_tokens_batch_async(texts, model_name, callback)
+	M._count_tokens_batch_primary(texts, model_name, function(token_counts, error)
+		if token_counts then
+			callback(token_counts, nil)
+			return
+		end
+
+		-- Degrade the way single counts do: estimate each text rather than failing the batch
+		local errors = require("token-count.utils.errors")
+		local estimates = {}
+		for i, text in ipairs(texts) do
+			estimates[i] = errors.get_fallback_estimate(text)
+		end
+		local message = type(error) == "table" and error.message or error
+		require("token-count.log").info("Using fallback estimation for batch: " .. tostring(message))
+		callback(estimates, nil)
 	end)
 end
 
+function M._count_tokens_batch_primary(texts, model_name, callback)
+	local venv = require("token-count.venv")
+	local errors = require("token-count.utils.errors")
+
+	local venv_utils = require("token-count.venv.utils")
+	local python_available, _ = venv_utils.check_python_available()
+	if not python_available then
+		callback(nil, "Python not available")
+		return
+	end
+
+	-- Same automatic venv setup as single counts, then retry the batch
+	local status = venv.get_status()
+	if not status.ready then
+		local error_obj = errors.create_error(errors.ErrorTypes.VENV_NOT_READY, "Virtual environment not ready")
+		errors.handle_with_recovery(error_obj, callback, function()
+			M._count_tokens_batch_primary(texts, model_name, callback)
+		end)
+		return
+	end
+
+	local config = require("token-count.config").get()
+	local daemon = require("token-count.daemon")
+
+	-- Official API counts for the whole batch are requested concurrently by the daemon
+	daemon.count_batch_async("tokencost", model_name, texts, function(token_counts, error)
+		if error then
+			callback(nil, "Tokencost error: " .. error)
+		else
+			callback(token_counts, nil)
+		end
+	end, counter_options(config))
+end
+
 --- Count tokens synchronously (blocks Neovim)
 --- @param text string The text to count tokens for
 --- @param model_name string The model name to use for counting
 --- @return number|nil token_count The number of tokens, or nil on error
 --- @return string|nil error Error message if counting failed
 function M.count_tokens_sync(text, model_name)
-	local script_path = vim.fn.fnamemodify(debug.getinfo(1, "S").source:sub(2), ":p:h") .. "/tokencost_counter.py"
-
 	-- Use the plugin's managed virtual environment
 	local venv = require("token-count.venv")
 
@@ -104,26 +149,17 @@ function M.count_tokens_sync(text, model_name)
 		return nil, "Virtual environment not ready. Run :TokenCountVenvSetup to initialize."
 	end
 
-	local python_path = venv.get_python_path()
 	local config = require("token-count.config").get()
-	
+	local daemon = require("token-count.daemon")
+
 	-- Pass configuration flags for official providers
-	local enable_anthropic = config.enable_official_anthropic_counter and "true" or "false"
-	local enable_gemini = config.enable_official_gemini_counter and "true" or "false"
-	
-	local cmd = { python_path, script_path, model_name, enable_anthropic, enable_gemini, text }
-	local result = vim.system(cmd, { text = true }):wait()
-
-	if result.code == 0 then
-		local cleaned_output = result.stdout:gsub("%s+", "")
-		local token_count = tonumber(cleaned_output)
-		if token_count then
-			return token_count, nil
-		else
-			return nil, "Invalid token count returned: " .. cleaned_output
-		end
+	local options = counter_options(config)
+
+	local token_count, error = daemon.count_sync("tokencost", model_name, text, options)
+	if token_count then
+		return token_count, nil
 	else
-		return nil, "Tokencost error: " .. (result.stderr or "Unknown error")
+		return nil, "Tokencost error: " .. error
 	end
 end
 
@@ -1,27 +1,61 @@
 #!/usr/bin/env python3
 """
 Token counting script for token-count.nvim using tokencost with fallback support
-Accepts model name and configuration flags, returns token count.
+Accepts text via stdin, model name and configuration flags as arguments, returns token count.
 """
 
+import asyncio
 import os
 import sys
-from typing import Optional
+import warnings
+from functools import lru_cache
+from typing import List, Optional
 
 import tokencost
 
+# Official SDKs are optional venv dependencies; imported once per process when present
+try:
+    import anthropic
+
+    _HAS_ANTHROPIC = True
+except ImportError:
+    _HAS_ANTHROPIC = False
+
+try:
+    import google.genai
+
+    _HAS_GENAI = True
+except ImportError:
+    _HAS_GENAI = False
+
+# tokencost warns about unsupported methods for some models but still returns estimates
+warnings.filterwarnings("ignore", module="tokencost")
+
+# Model families (name up to the first "-") whose tokencost counts go through remote APIs;
+# estimated locally unless exact counts are requested
+REMOTE_MODEL_FAMILIES = {"claude", "gemini"}
+
+# Official API clients, created on first use and reused so connections stay alive between counts
+_anthropic_client = None
+_anthropic_async_client = None
+_gemini_client = None
+# Connections of the async clients are bound to the loop they were opened on
+_event_loop = None
+
 
 def count_with_official_anthropic(text: str, model: str) -> Optional[int]:
     """Try to count tokens using official Anthropic API if enabled and available."""
+    global _anthropic_client
+    if not _HAS_ANTHROPIC:
+        return None
     try:
-        import anthropic
-        
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             return None
-            
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.beta.messages.count_tokens(
+
+        if _anthropic_client is None:
+            _anthropic_client = anthropic.Anthropic(api_key=api_key)
+        response = _anthropic_client.beta.messages.count_tokens(
             betas=["token-counting-2024-11-01"],
             model=model,
             messages=[{"role": "user", "content": text}]
@@ -33,15 +67,17 @@ def count_with_official_anthropic(text: str, model: str) -> Optional[int]:
 
 def count_with_official_gemini(text: str, model: str) -> Optional[int]:
     """Try to count tokens using official Gemini API if enabled and available."""
+    global _gemini_client
+    if not _HAS_GENAI:
+        return None
     try:
-        import google.genai
-        
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             return None
-            
-        client = google.genai.Client(api_key=api_key)
-        response = client.models.count_tokens(
+
+        if _gemini_client is None:
+            _gemini_client = google.genai.Client(api_key=api_key)
+        response = _gemini_client.models.count_tokens(
             model=model,
             contents=[{"parts": [{"text": text}]}]
         )
@@ -50,73 +86,189 @@ def count_with_official_gemini(text: str, model: str) -> Optional[int]:
         return None
 
 
+async def count_with_official_anthropic_async(text: str, model: str) -> Optional[int]:
+    """Async variant of count_with_official_anthropic, for concurrent batch requests."""
+    global _anthropic_async_client
+    if not _HAS_ANTHROPIC:
+        return None
+    try:
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            return None
+
+        if _anthropic_async_client is None:
+            _anthropic_async_client = anthropic.AsyncAnthropic(api_key=api_key)
+        response = await _anthropic_async_client.beta.messages.count_tokens(
+            betas=["token-counting-2024-11-01"],
+            model=model,
+            messages=[{"role": "user", "content": text}]
+        )
+        return response.input_tokens
+    except Exception:
+        return None
+
+
+async def count_with_official_gemini_async(text: str, model: str) -> Optional[int]:
+    """Async variant of count_with_official_gemini, for concurrent batch requests."""
+    global _gemini_client
+    if not _HAS_GENAI:
+        return None
+    try:
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            return None
+
+        if _gemini_client is None:
+            _gemini_client = google.genai.Client(api_key=api_key)
+        response = await _gemini_client.aio.models.count_tokens(
+            model=model,
+            contents=[{"parts": [{"text": text}]}]
+        )
+        return response.total_tokens
+    except Exception:
+        return None
+
+
+# Model family -> official API counter, used when that provider's counter is enabled
+OFFICIAL_COUNTERS = {
+    "claude": count_with_official_anthropic,
+    "gemini": count_with_official_gemini,
+}
+
+# Same, for batches whose requests are sent concurrently
+OFFICIAL_ASYNC_COUNTERS = {
+    "claude": count_with_official_anthropic_async,
+    "gemini": count_with_official_gemini_async,
+}
+
+
+def _run(coro):
+    """Run a coroutine on the module's persistent event loop."""
+    global _event_loop
+    if _event_loop is None:
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop.run_until_complete(coro)
+
+
+def model_family(model: str) -> str:
+    """Return the model family used for provider dispatch, e.g. "claude" for claude-3-opus."""
+    return model.split("-", 1)[0]
+
+
+def uses_official_counter(model: str, enable_anthropic: bool = False, enable_gemini: bool = False, **_) -> bool:
+    """Check whether counts for model go to its provider's official API."""
+    enabled = {"claude": enable_anthropic, "gemini": enable_gemini}
+    return enabled.get(model_family(model), False)
+
+
+@lru_cache(maxsize=1)
+def _estimate_encoding():
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_with_local_estimate(text: str) -> int:
+    """Estimate tokens locally with tiktoken's cl100k_base, avoiding a network round-trip."""
+    try:
+        return len(_estimate_encoding().encode_ordinary(text))
+    except Exception:
+        # Using ~4 chars per token as a rough estimate if tiktoken is unavailable
+        return len(text) // 4
+
+
 def count_with_tokencost(text: str, model: str) -> int:
     """Count tokens using tokencost library (estimates for most models)."""
-    # The tokencost library sometimes warns about unsupported methods for Anthropic models
-    # but should still provide estimates. Let's suppress warnings and handle any exceptions
-    import warnings
-    import sys
-    import io
-    
-    # Capture and filter stderr to avoid tokencost warnings from being treated as errors
-    old_stderr = sys.stderr
-    sys.stderr = captured_stderr = io.StringIO()
-    
     try:
-        # Suppress warnings at both Python and tokencost level
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            
+        return tokencost.count_string_tokens(text, model)
+    except Exception:
+        # If count_string_tokens fails for Anthropic models, try count_message_tokens
+        if model.startswith("claude") and hasattr(tokencost, "count_message_tokens"):
             try:
-                result = tokencost.count_string_tokens(text, model)
-                return result
-            except Exception as e:
-                # If count_string_tokens fails for Anthropic models, try count_message_tokens
-                if model.startswith("claude") and hasattr(tokencost, 'count_message_tokens'):
-                    try:
-                        messages = [{"role": "user", "content": text}]
-                        return tokencost.count_message_tokens(messages, model)
-                    except Exception:
-                        # If both methods fail, provide a rough estimate
-                        # Using ~4 chars per token as a rough estimate for Claude models
-                        return len(text) // 4
-                else:
-                    # Re-raise for non-Claude models
-                    raise e
-    finally:
-        # Restore stderr but check if there were any real errors (not warnings)
-        sys.stderr = old_stderr
-        captured_output = captured_stderr.getvalue()
-        
-        # Only output stderr if it contains actual errors, not warnings
-        if captured_output and not ("Warning:" in captured_output and "does not support this method" in captured_output):
-            print(captured_output, file=sys.stderr, end="")
+                messages = [{"role": "user", "content": text}]
+                return tokencost.count_message_tokens(messages, model)
+            except Exception:
+                # If both methods fail, provide a rough estimate
+                # Using ~4 chars per token as a rough estimate for Claude models
+                return len(text) // 4
+        # Re-raise for non-Claude models
+        raise
+
+
+def warm(model: str):
+    """Load the tokenizer that counts for model will use, ahead of the first count."""
+    try:
+        if model_family(model) in REMOTE_MODEL_FAMILIES:
+            _estimate_encoding()
+        else:
+            count_with_tokencost("", model)
+    except Exception:
+        # Counting reports its own errors; warming is best effort
+        pass
+
+
+def count_tokens(
+    text: str, model: str, enable_anthropic: bool = False, enable_gemini: bool = False, exact: bool = True
+) -> int:
+    """Count tokens for text, preferring official provider APIs when enabled.
+
+    Without exact, Claude/Gemini models whose official counter is not enabled are
+    estimated locally instead of going through tokencost's remote lookups.
+    """
+    token_count = None
+    family = model_family(model)
+
+    # Try the official API for the model's provider if it is enabled
+    if uses_official_counter(model, enable_anthropic, enable_gemini):
+        token_count = OFFICIAL_COUNTERS[family](text, model)
+
+    # Estimate remote-only models locally unless exact counts are requested
+    if token_count is None and not exact and family in REMOTE_MODEL_FAMILIES:
+        token_count = count_with_local_estimate(text)
+
+    # Fallback to tokencost for all models
+    if token_count is None:
+        token_count = count_with_tokencost(text, model)
+
+    return token_count
+
+
+def count_tokens_batch(
+    texts: List[str], model: str, enable_anthropic: bool = False, enable_gemini: bool = False, exact: bool = True
+) -> List[int]:
+    """Count tokens for several texts, sending official API requests concurrently."""
+    if not uses_official_counter(model, enable_anthropic, enable_gemini):
+        return [count_tokens(text, model, exact=exact) for text in texts]
+
+    official = OFFICIAL_ASYNC_COUNTERS[model_family(model)]
+
+    async def gather_counts():
+        return await asyncio.gather(*[official(text, model) for text in texts])
+
+    # Texts the API could not count fall back the same way single counts do
+    return [
+        count if count is not None else count_tokens(text, model, exact=exact)
+        for text, count in zip(texts, _run(gather_counts()))
+    ]
 
 
 def main():
-    if len(sys.argv) != 5:
-        print("Usage: tokencost_counter.py <model> <enable_anthropic> <enable_gemini> <text>", file=sys.stderr)
+    args = sys.argv[1:]
+    fast = "--fast" in args
+    if fast:
+        args.remove("--fast")
+
+    if len(args) != 3:
+        print("Usage: tokencost_counter.py [--fast] <model> <enable_anthropic> <enable_gemini> < text", file=sys.stderr)
         sys.exit(1)
 
-    model = sys.argv[1]
-    enable_anthropic = sys.argv[2].lower() == "true"
-    enable_gemini = sys.argv[3].lower() == "true"
-    text = sys.argv[4]
+    model = args[0]
+    enable_anthropic = args[1].lower() == "true"
+    enable_gemini = args[2].lower() == "true"
+    text = sys.stdin.buffer.read().decode("utf-8")
 
     try:
-        token_count = None
-        
-        # Try official Anthropic API if enabled and model is Anthropic
-        if enable_anthropic and model.startswith("claude"):
-            token_count = count_with_official_anthropic(text, model)
-            
-        # Try official Gemini API if enabled and model is Gemini
-        if token_count is None and enable_gemini and model.startswith("gemini"):
-            token_count = count_with_official_gemini(text, model)
-            
-        # Fallback to tokencost for all models
-        if token_count is None:
-            token_count = count_with_tokencost(text, model)
+        token_count = count_tokens(text, model, enable_anthropic, enable_gemini, exact=not fast)
 
         print(token_count)
 
@@ -37,6 +37,8 @@
 --- @field context_warning_threshold number Threshold for context usage warnings (0-1)
 --- @field enable_official_anthropic_counter boolean Use Anthropic API for exact counts
 --- @field enable_official_gemini_counter boolean Use Gemini API for exact counts
+--- @field exact_counts boolean Skip local estimates and always count exactly
+--- @field exact_threshold number|false Texts longer than this many characters are estimated unless exact_counts is set
 --- @field cache CacheConfig Cache system configuration
 --- @field lazy_loading table? Lazy loading options (internal)
 
@@ -80,6 +82,7 @@
 --- @class TokenProvider
 --- @field count_tokens_async fun(text: string, encoding: string, callback: fun(count: number?, error: string?)) Asynchronous token counting
 --- @field count_tokens_sync fun(text: string, encoding: string): number?, string? Synchronous token counting (may block)
+--- @field count_tokens_batch_async fun(texts: string[], encoding: string, callback: fun(counts: number[]?, error: string?))? Optional batched counting in one request
 --- @field check_availability fun(): boolean, string? Check if provider is available
 
 --- Callback type for asynchronous token counting operations
@@ -44,6 +44,12 @@ function M._count_multiple_buffers_impl(buffer_ids, model_config, callback)
 		return
 	end
 
+	-- Providers with batch support count every buffer in a single request
+	if provider.count_tokens_batch_async then
+		M._count_multiple_buffers_batch(provider, buffer_ids, model_config, callback)
+		return
+	end
+
 	local total_tokens = 0
 	local completed = 0
 	local buffer_results = {}
@@ -88,6 +94,41 @@ function M._count_multiple_buffers_impl(buffer_ids, model_config, callback)
 	end
 end
 
+--- Count multiple buffers with a single batched provider request
+--- @param provider table Provider module implementing count_tokens_batch_async
+--- @param buffer_ids number[] Array of buffer IDs
+--- @param model_config table Model configuration
+--- @param callback function Callback that receives (total_tokens, buffer_results, error)
+function M._count_multiple_buffers_batch(provider, buffer_ids, model_config, callback)
+	local buffer = require("token-count.buffer")
+
+	local contents = {}
+	for i, buf_id in ipairs(buffer_ids) do
+		contents[i] = buffer.get_buffer_contents(buf_id) or ""
+	end
+
+	provider.count_tokens_batch_async(contents, model_config.encoding, function(token_counts, error)
+		if error then
+			callback(nil, nil, error)
+			return
+		end
+
+		local total_tokens = 0
+		local buffer_results = {}
+		for i, buf_id in ipairs(buffer_ids) do
+			local token_count = token_counts[i] or 0
+			total_tokens = total_tokens + token_count
+			table.insert(buffer_results, {
+				buffer_id = buf_id,
+				name = M.get_buffer_display_name(buf_id),
+				tokens = token_count,
+			})
+		end
+
+		callback(total_tokens, buffer_results, nil)
+	end)
+end
+
 --- Validate current buffer and get content
 --- @return string|nil content Buffer content, or nil if invalid
 --- @return string|nil error Error message if validation failed